@@ -0,0 +1,54 @@
+"""In-memory column cache of active listings for the ranking path"""
+
+import threading
+import time
+from dataclasses import fields
+from operator import itemgetter
+from typing import List, Optional, Tuple
+from database import RankingListing, iter_active_ranking_rows, get_data_version
+from listing_batch import FIELDS, ListingBatch
+
+# Seconds before the cache is rebuilt even without a local write, so
+# listings stored by a separate scraper process show up
+LISTINGS_CACHE_TTL = 60
+
+
+# Picks the ListingBatch numeric fields out of a RankingListing row tuple
+_ROW_FIELDS = [field.name for field in fields(RankingListing)]
+_numeric_values = itemgetter(*(_ROW_FIELDS.index(name) for name in FIELDS))
+
+_lock = threading.Lock()
+_cached: Optional[ListingBatch] = None
+_cached_version = None
+_cached_at = 0.0
+
+
+def get_soa() -> ListingBatch:
+    """
+    Return the active listings in struct-of-arrays form, rebuilding them
+    when this process has written listings or the cache has expired
+    """
+    global _cached, _cached_version, _cached_at
+    
+    with _lock:
+        version = get_data_version()
+        if (_cached is None or _cached_version != version
+                or time.time() - _cached_at >= LISTINGS_CACHE_TTL):
+            _cached = _load()
+            _cached_version = version
+            _cached_at = time.time()
+        return _cached
+
+
+def _load() -> ListingBatch:
+    """
+    Read the active listings into a batch, taking the numeric columns
+    straight from the row tuples, a chunk at a time
+    """
+    meta: List[RankingListing] = []
+    rows: List[Tuple] = []
+    for chunk in iter_active_ranking_rows():
+        meta.extend(RankingListing(*row) for row in chunk)
+        rows.extend(map(_numeric_values, chunk))
+    
+    return ListingBatch.from_rows(meta, rows)
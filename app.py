@@ -1,13 +1,59 @@
 """Flask web application for Apartment Hunt Optimizer"""
 
+import hashlib
+import heapq
+import os
+import time
+import numpy as np
+import orjson
 from flask import Flask, render_template, request, jsonify
-from database import get_all_apartments
+from flask.json.provider import JSONProvider
+from database import get_all_apartments, get_data_version
 from preferences import UserPreferences
-from scoring import ApartmentScorer, filter_apartments
+from scoring import ApartmentScorer, requirements_mask
 from geocoding import geocode_address_nominatim
+from apartments_cache import get_soa
 import json
 
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, which encodes much faster than json"""
+    
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=self.options).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """
+        Serialize the arguments like jsonify: one positional argument as is,
+        several as a list, keyword arguments as an object
+        """
+        if args and kwargs:
+            raise TypeError("response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        
+        # Hand orjson's bytes straight to the response, skipping a decode
+        return self._app.response_class(
+            orjson.dumps(obj, option=self.options),
+            mimetype='application/json'
+        )
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# Serve /api/rank and /api/rank/ alike instead of redirecting
+app.url_map.strict_slashes = False
+
+# Number of ranked apartments returned by /api/rank (the results page shows 20)
+MAX_RESULTS = 20
+
+# Seconds an encoded /api/apartments response is reused
+APARTMENTS_CACHE_TTL = 60
+_apartments_cache = None
 
 
 @app.route('/')
@@ -19,12 +65,30 @@ def index():
 @app.route('/api/apartments')
 def get_apartments():
     """API endpoint to get all apartments"""
-    apartments = get_all_apartments(active_only=True)
-    return jsonify({
-        'success': True,
-        'count': len(apartments),
-        'apartments': apartments
-    })
+    global _apartments_cache
+    
+    # Listings only change when the scraper runs, so reuse the encoded
+    # response until it expires or this process writes to the database
+    version = get_data_version()
+    if (_apartments_cache is None
+            or _apartments_cache['version'] != version
+            or time.time() - _apartments_cache['ts'] >= APARTMENTS_CACHE_TTL):
+        apartments = get_all_apartments(active_only=True)
+        body = orjson.dumps({
+            'success': True,
+            'count': len(apartments),
+            'apartments': apartments
+        }, option=OrjsonProvider.options)
+        _apartments_cache = {
+            'ts': time.time(),
+            'version': version,
+            'body': body,
+            'etag': hashlib.md5(body).hexdigest()
+        }
+    
+    response = app.response_class(_apartments_cache['body'], mimetype='application/json')
+    response.set_etag(_apartments_cache['etag'])
+    return response.make_conditional(request)
 
 
 @app.route('/api/rank', methods=['POST'])
@@ -59,9 +123,9 @@ def rank_apartments():
                     'error': f'Could not geocode work address: {work_address}'
                 }), 400
         
-        # Get and filter apartments
-        listings = get_all_apartments(active_only=True)
-        filtered = filter_apartments(listings, prefs)
+        # Select apartments meeting the requirements from the cached columns
+        batch = get_soa()
+        filtered = batch.take(np.flatnonzero(requirements_mask(batch, prefs)))
         
         if not filtered:
             return jsonify({
@@ -75,8 +139,7 @@ def rank_apartments():
         scorer = ApartmentScorer(prefs)
         ranked = []
         
-        for listing in filtered:
-            score_data = scorer.score_apartment(listing)
+        for listing, score_data in zip(filtered.meta, scorer.score_batch(filtered)):
             ranked.append({
                 'listing': listing,
                 'score': score_data['total_score'],
@@ -84,12 +147,12 @@ def rank_apartments():
                 'commute_info': score_data['commute_info']
             })
         
-        # Sort by score
-        ranked.sort(key=lambda x: x['score'], reverse=True)
+        # Only the best matches are displayed, no need to sort the rest
+        top = heapq.nlargest(MAX_RESULTS, ranked, key=lambda x: x['score'])
         
         return jsonify({
             'success': True,
-            'apartments': ranked,
+            'apartments': top,
             'count': len(ranked),
             'preferences': prefs.to_dict()
         })
@@ -129,4 +192,7 @@ def geocode():
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='127.0.0.1', port=5000)
+    # Development server only; in production run under a WSGI server, e.g.
+    #   gunicorn -w 4 -k gthread --threads 8 app:app
+    # Set FLASK_DEBUG=1 for the reloader and debugger
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True, host='127.0.0.1', port=5000)
@@ -8,10 +8,16 @@ STATE = "IA"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 REQUEST_TIMEOUT = 10
 REQUEST_DELAY = 2  # seconds between requests
+SCRAPER_WORKERS = 4  # pages fetched concurrently, still spaced REQUEST_DELAY apart
 
 # Database
 DB_PATH = "apartments.db"
 
+# Geocoding cache
+GEOCODE_CACHE_PATH = "geocode_cache.db"
+GEOCODE_CACHE_TTL = 30 * 24 * 3600  # seconds before a cached hit is refreshed
+GEOCODE_NEGATIVE_TTL = 24 * 3600  # seconds before a failed lookup is retried
+
 # Zillow search parameters
 ZILLOW_BASE_URL = "https://www.zillow.com"
 ZILLOW_SEARCH_URL = f"{ZILLOW_BASE_URL}/des-moines-ia/rentals/"
@@ -1,118 +1,290 @@
 """Database operations for apartment listings"""
 
 import sqlite3
-from datetime import datetime
-from typing import Optional, List, Dict
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Optional, List, Dict, Tuple
 from config import DB_PATH
 
+# Columns read into RankingListing, in field order
+_RANKING_SELECT = """
+    SELECT id, address, price, bedrooms, bathrooms, sqft, listing_url, latitude, longitude
+    FROM apartments
+"""
+
+# Hard requirements for get_apartments_for_ranking, same rules as
+# scoring.filter_apartments: a missing price, bathroom count or sqft doesn't
+# disqualify a listing, nor does a missing bedroom count
+_REQUIREMENTS_WHERE = """
+    WHERE is_active = 1
+    AND (price IS NULL OR price = 0 OR price BETWEEN ? AND ?)
+    AND (bedrooms IS NULL OR bedrooms >= ?)
+    AND (bathrooms IS NULL OR bathrooms = 0 OR bathrooms >= ?)
+    AND (sqft IS NULL OR sqft = 0 OR sqft >= ?)
+"""
+
+
+# Write statements are module constants so their text is identical on every
+# call and the connection's statement cache can reuse the compiled form
+_INSERT_SQL = """
+    INSERT INTO apartments (
+        address, city, state, zip_code, price, bedrooms, bathrooms,
+        sqft, listing_url, source, amenities, description,
+        first_seen, last_seen, latitude, longitude
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPDATE_SQL = """
+    UPDATE apartments 
+    SET last_seen = ?,
+        is_active = 1,
+        price = ?,
+        sqft = ?,
+        amenities = ?,
+        description = ?,
+        latitude = COALESCE(?, latitude),
+        longitude = COALESCE(?, longitude)
+    WHERE listing_url = ?
+"""
+
+# Listings matching an existing URL get last_seen bumped and are
+# reactivated; ones clashing only on address are left untouched
+_UPSERT_SQL = _INSERT_SQL + """
+    ON CONFLICT(listing_url) DO UPDATE SET
+        last_seen = excluded.last_seen,
+        is_active = 1,
+        price = excluded.price,
+        sqft = excluded.sqft,
+        amenities = excluded.amenities,
+        description = excluded.description,
+        latitude = COALESCE(excluded.latitude, latitude),
+        longitude = COALESCE(excluded.longitude, longitude)
+    ON CONFLICT DO NOTHING
+"""
+
+
+@dataclass(slots=True)
+class RankingListing:
+    """The subset of an apartment row needed to score and display it"""
+    id: int
+    address: str
+    price: Optional[int]
+    bedrooms: Optional[float]
+    bathrooms: Optional[float]
+    sqft: Optional[int]
+    listing_url: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access so listings can go through the scoring helpers"""
+        return getattr(self, key, default)
+
+
+# One connection per thread, kept open for the life of the thread
+_local = threading.local()
+
+# Bumped on every write to apartments so in-process caches know to rebuild
+_data_version = 0
+
+
+def get_data_version() -> int:
+    """Return a counter that changes whenever this process writes listings"""
+    return _data_version
+
+
+def _bump_data_version():
+    global _data_version
+    _data_version += 1
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Return this thread's database connection, opening it on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        # Read paths don't go through init_db, so bring old schemas up to date here
+        with conn:
+            _add_coordinate_columns(conn.cursor())
+        _local.conn = conn
+    return conn
+
+
+def _add_coordinate_columns(cursor):
+    """Add latitude/longitude to an apartments table created before they were stored"""
+    cursor.execute("PRAGMA table_info(apartments)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if not columns:
+        # Table doesn't exist yet, init_db creates it with the columns
+        return
+    
+    for column in ('latitude', 'longitude'):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE apartments ADD COLUMN {column} REAL")
+
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS apartments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            address TEXT NOT NULL,
-            city TEXT NOT NULL,
-            state TEXT NOT NULL,
-            zip_code TEXT,
-            price INTEGER,
-            bedrooms REAL,
-            bathrooms REAL,
-            sqft INTEGER,
-            listing_url TEXT UNIQUE NOT NULL,
-            source TEXT NOT NULL,
-            amenities TEXT,
-            description TEXT,
-            first_seen DATE NOT NULL,
-            last_seen DATE NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            UNIQUE(address, city, state)
-        )
-    """)
-    
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_price ON apartments(price)
-    """)
+    conn = _get_conn()
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_active ON apartments(is_active)
-    """)
+    with conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS apartments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                address TEXT NOT NULL,
+                city TEXT NOT NULL,
+                state TEXT NOT NULL,
+                zip_code TEXT,
+                price INTEGER,
+                bedrooms REAL,
+                bathrooms REAL,
+                sqft INTEGER,
+                listing_url TEXT UNIQUE NOT NULL,
+                source TEXT NOT NULL,
+                amenities TEXT,
+                description TEXT,
+                first_seen DATE NOT NULL,
+                last_seen DATE NOT NULL,
+                is_active INTEGER DEFAULT 1,
+                latitude REAL,
+                longitude REAL,
+                UNIQUE(address, city, state)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_price ON apartments(price)
+        """)
+        
+        # Covers the active filter and the price sort in get_all_apartments
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_active_price ON apartments(is_active, price)
+        """)
+        
+        cursor.execute("""
+            DROP INDEX IF EXISTS idx_active
+        """)
+        
+        # Lets mark_inactive_listings range-scan stale active listings
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_active_last_seen ON apartments(is_active, last_seen)
+        """)
+        
+        # Geocoding results now live in their own database (geocode_cache.py)
+        cursor.execute("""
+            DROP TABLE IF EXISTS geocode_cache
+        """)
     
-    conn.commit()
-    conn.close()
     print("Database initialized successfully")
 
 
+def _insert_params(apartment_data: Dict, today: str) -> Tuple:
+    """Parameters for _INSERT_SQL / _UPSERT_SQL"""
+    return (
+        apartment_data.get('address'),
+        apartment_data.get('city'),
+        apartment_data.get('state'),
+        apartment_data.get('zip_code'),
+        apartment_data.get('price'),
+        apartment_data.get('bedrooms'),
+        apartment_data.get('bathrooms'),
+        apartment_data.get('sqft'),
+        apartment_data.get('listing_url'),
+        apartment_data.get('source'),
+        apartment_data.get('amenities'),
+        apartment_data.get('description'),
+        today,
+        today,
+        apartment_data.get('latitude'),
+        apartment_data.get('longitude')
+    )
+
+
 def insert_apartment(apartment_data: Dict) -> bool:
     """
     Insert or update apartment listing
     Returns True if new listing, False if updated existing
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = _get_conn()
     
     today = datetime.now().date().isoformat()
     
     try:
         # Try to insert new listing
-        cursor.execute("""
-            INSERT INTO apartments (
-                address, city, state, zip_code, price, bedrooms, bathrooms,
-                sqft, listing_url, source, amenities, description,
-                first_seen, last_seen
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            apartment_data.get('address'),
-            apartment_data.get('city'),
-            apartment_data.get('state'),
-            apartment_data.get('zip_code'),
-            apartment_data.get('price'),
-            apartment_data.get('bedrooms'),
-            apartment_data.get('bathrooms'),
-            apartment_data.get('sqft'),
-            apartment_data.get('listing_url'),
-            apartment_data.get('source'),
-            apartment_data.get('amenities'),
-            apartment_data.get('description'),
-            today,
-            today
-        ))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute(_INSERT_SQL, _insert_params(apartment_data, today))
+        _bump_data_version()
         return True
         
     except sqlite3.IntegrityError:
         # Listing exists, update last_seen and reactivate if needed
-        cursor.execute("""
-            UPDATE apartments 
-            SET last_seen = ?,
-                is_active = 1,
-                price = ?,
-                sqft = ?,
-                amenities = ?,
-                description = ?
-            WHERE listing_url = ?
-        """, (
-            today,
-            apartment_data.get('price'),
-            apartment_data.get('sqft'),
-            apartment_data.get('amenities'),
-            apartment_data.get('description'),
-            apartment_data.get('listing_url')
-        ))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute(_UPDATE_SQL, (
+                today,
+                apartment_data.get('price'),
+                apartment_data.get('sqft'),
+                apartment_data.get('amenities'),
+                apartment_data.get('description'),
+                apartment_data.get('latitude'),
+                apartment_data.get('longitude'),
+                apartment_data.get('listing_url')
+            ))
+        _bump_data_version()
         return False
 
 
+def insert_apartments_bulk(apartment_data_list: List[Dict]) -> Tuple[int, int]:
+    """
+    Insert or update many apartment listings in a single transaction
+    Returns (new_count, updated_count)
+    """
+    conn = _get_conn()
+    
+    today = datetime.now().date().isoformat()
+    
+    # Count new vs. updated up front, the upsert itself can't tell us
+    existing_urls = set()
+    existing_addresses = set()
+    for url, address, city, state in conn.execute(
+        "SELECT listing_url, address, city, state FROM apartments"
+    ):
+        existing_urls.add(url)
+        existing_addresses.add((address, city, state))
+    
+    new_count = 0
+    for apartment_data in apartment_data_list:
+        url = apartment_data.get('listing_url')
+        address = (
+            apartment_data.get('address'),
+            apartment_data.get('city'),
+            apartment_data.get('state')
+        )
+        if url not in existing_urls and address not in existing_addresses:
+            new_count += 1
+        existing_urls.add(url)
+        existing_addresses.add(address)
+    
+    with conn:
+        conn.executemany(_UPSERT_SQL, [
+            _insert_params(apartment_data, today)
+            for apartment_data in apartment_data_list
+        ])
+    
+    _bump_data_version()
+    return new_count, len(apartment_data_list) - new_count
+
+
 def get_all_apartments(active_only: bool = True) -> List[Dict]:
     """Retrieve all apartment listings"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    cursor = _get_conn().cursor()
+    cursor.row_factory = sqlite3.Row
     
     query = "SELECT * FROM apartments"
     if active_only:
@@ -120,29 +292,52 @@ def get_all_apartments(active_only: bool = True) -> List[Dict]:
     query += " ORDER BY price ASC"
     
     cursor.execute(query)
-    results = [dict(row) for row in cursor.fetchall()]
-    
-    conn.close()
-    return results
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def get_apartments_for_ranking(min_rent: int, max_rent: int, min_bedrooms: float,
+                               min_bathrooms: float, min_sqft: int) -> List[RankingListing]:
+    """
+    Active listings meeting the hard requirements, reading only the columns
+    the ranking needs into lightweight RankingListing records
+    """
+    cursor = _get_conn().execute(
+        _RANKING_SELECT + _REQUIREMENTS_WHERE + "ORDER BY price ASC",
+        (min_rent, max_rent, min_bedrooms, min_bathrooms, min_sqft)
+    )
+    return [RankingListing(*row) for row in cursor.fetchall()]
+
+
+def iter_active_ranking_rows(chunk_size: int = 1000) -> Iterator[List[Tuple]]:
+    """
+    All active listings as plain tuples in RankingListing field order,
+    cheapest first, read chunk_size rows at a time
+    """
+    cursor = _get_conn().execute(
+        _RANKING_SELECT + "WHERE is_active = 1 ORDER BY price ASC"
+    )
+    yield from iter(lambda: cursor.fetchmany(chunk_size), [])
 
 
 def mark_inactive_listings(days_old: int = 2):
     """Mark listings as inactive if not seen in specified days"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = _get_conn()
     
-    cursor.execute("""
-        UPDATE apartments
-        SET is_active = 0
-        WHERE julianday('now') - julianday(last_seen) >= ?
-        AND is_active = 1
-    """, (days_old,))
+    # Same cutoff as julianday('now') - julianday(last_seen) >= days_old, but
+    # computed once and compared as text so idx_active_last_seen can be used
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days_old)).strftime('%Y-%m-%d %H:%M:%S')
     
-    affected = cursor.rowcount
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.execute("""
+            UPDATE apartments
+            SET is_active = 0
+            WHERE last_seen <= ?
+            AND is_active = 1
+        """, (cutoff,))
     
+    affected = cursor.rowcount
     if affected > 0:
+        _bump_data_version()
         print(f"Marked {affected} listing(s) as inactive")
 
 
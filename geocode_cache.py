@@ -0,0 +1,112 @@
+"""Persistent on-disk cache of geocoding results"""
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+from config import CITY, STATE, GEOCODE_CACHE_PATH, GEOCODE_CACHE_TTL, GEOCODE_NEGATIVE_TTL
+
+# Common street suffixes, so "123 Main Street" and "123 Main St" share a cache key
+_STREET_SUFFIXES = {
+    'street': 'st',
+    'avenue': 'ave',
+    'road': 'rd',
+    'drive': 'dr',
+    'boulevard': 'blvd',
+    'lane': 'ln',
+    'court': 'ct',
+    'place': 'pl',
+    'parkway': 'pkwy',
+}
+
+# One connection per thread, kept open for the life of the thread
+_local = threading.local()
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Return this thread's cache connection, opening it on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(GEOCODE_CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    normalized_address TEXT PRIMARY KEY,
+                    raw_address TEXT NOT NULL,
+                    lat REAL,
+                    lng REAL,
+                    ts INTEGER NOT NULL
+                )
+            """)
+        _local.conn = conn
+    return conn
+
+
+def normalize_address(address: str) -> str:
+    """
+    Cache key for an address: lowercased, punctuation stripped, whitespace
+    collapsed, street suffixes abbreviated and a trailing city/state dropped
+    if it is the configured search area
+    """
+    words = re.sub(r'[^a-z0-9 ]+', ' ', address.lower()).split()
+    words = [_STREET_SUFFIXES.get(word, word) for word in words]
+    
+    for suffix in (STATE.lower().split(), CITY.lower().split()):
+        if len(words) > len(suffix) and words[-len(suffix):] == suffix:
+            words = words[:-len(suffix)]
+    
+    return ' '.join(words)
+
+
+def lookup(key: str) -> Tuple[bool, Optional[Tuple[float, float]], float]:
+    """
+    Look up a normalized address
+    Returns (hit, coords, expires_at); coords is None for a cached failed
+    lookup. Entries past their TTL count as misses.
+    """
+    row = _get_conn().execute("""
+        SELECT lat, lng, ts FROM geocode_cache WHERE normalized_address = ?
+    """, (key,)).fetchone()
+    
+    if not row:
+        return False, None, 0.0
+    
+    lat, lng, ts = row
+    expires_at = ts + (GEOCODE_CACHE_TTL if lat is not None else GEOCODE_NEGATIVE_TTL)
+    if time.time() >= expires_at:
+        return False, None, 0.0
+    
+    return True, ((lat, lng) if lat is not None else None), expires_at
+
+
+def store(key: str, raw_address: str, coords: Optional[Tuple[float, float]]) -> float:
+    """Cache a geocoding result (None for a failed lookup), returns when it expires"""
+    conn = _get_conn()
+    
+    lat, lng = coords if coords else (None, None)
+    ts = int(time.time())
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO geocode_cache (normalized_address, raw_address, lat, lng, ts)
+            VALUES (?, ?, ?, ?, ?)
+        """, (key, raw_address, lat, lng, ts))
+    
+    return ts + (GEOCODE_CACHE_TTL if coords else GEOCODE_NEGATIVE_TTL)
+
+
+def purge_expired() -> int:
+    """Delete entries past their TTL, returns the number removed"""
+    conn = _get_conn()
+    
+    now = int(time.time())
+    with conn:
+        cursor = conn.execute("""
+            DELETE FROM geocode_cache
+            WHERE (lat IS NOT NULL AND ts <= ?)
+            OR (lat IS NULL AND ts <= ?)
+        """, (now - GEOCODE_CACHE_TTL, now - GEOCODE_NEGATIVE_TTL))
+    
+    return cursor.rowcount
@@ -1,10 +1,49 @@
 """Geocoding and distance calculation utilities"""
 
+import threading
+import numpy as np
 import requests
 import time
-from typing import Optional, Tuple
-from math import radians, cos, sin, asin, sqrt
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from math import radians, cos, sin, asin, sqrt, hypot
+import geocode_cache
+from listing_batch import Listing
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, fall back to plain Python
+    def njit(*args, **kwargs):  # type: ignore[no-redef]
+        return lambda f: f
+
+# Nominatim allows at most one request per second across all threads
+NOMINATIM_MIN_INTERVAL = 1.0
+_rate_lock = threading.Lock()
+_next_request = 0.0
+
+# Throttled and failed requests are retried by _query_nominatim rather
+# than the adapter, so every attempt waits for its own rate limit slot
+NOMINATIM_RETRIES = 3
+NOMINATIM_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Keep-alive session for Nominatim
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_session.headers.update({'User-Agent': 'ApartmentHuntOptimizer/1.0'})
+
+# Shared pool for geocode_many
+_pool = ThreadPoolExecutor(max_workers=4)
+
+# In-process memo in front of the on-disk cache, normalized address ->
+# (coords, expires_at), so entries expire on the same TTLs as on disk
+GEOCODE_MEMO_SIZE = 4096
+_memo: 'OrderedDict[str, Tuple[Optional[Tuple[float, float]], float]]' = OrderedDict()
+_memo_lock = threading.Lock()
+
+@njit(cache=True, fastmath=True)
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate the great circle distance between two points 
@@ -12,7 +51,10 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     Returns distance in miles
     """
     # Convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    lon1 = radians(lon1)
+    lat1 = radians(lat1)
+    lon2 = radians(lon2)
+    lat2 = radians(lat2)
     
     # Haversine formula
     dlon = lon2 - lon1
@@ -25,41 +67,192 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return miles
 
 
+def haversine_distance_array(lats: np.ndarray, lons: np.ndarray, lat2: float, lon2: float) -> np.ndarray:
+    """
+    Vectorized haversine_distance from many points to a single point
+    Returns distances in miles, NaN wherever lats/lons are NaN
+    """
+    lat1 = np.radians(lats)
+    lon1 = np.radians(lons)
+    lat2, lon2 = radians(lat2), radians(lon2)
+    
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(a))
+    
+    return 3959 * c
+
+
+@njit(cache=True, fastmath=True)
+def equirectangular_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Flat-earth approximation of haversine_distance, accurate to well under
+    1% over commuting distances and far cheaper (one cos, no asin/sin)
+    Returns distance in miles
+    """
+    lat_avg = radians((lat1 + lat2) / 2)
+    dx = radians(lon2 - lon1) * cos(lat_avg)
+    dy = radians(lat2 - lat1)
+    return 3959 * hypot(dx, dy)
+
+
+def equirectangular_distance_array(lats: np.ndarray, lons: np.ndarray, lat2: float, lon2: float) -> np.ndarray:
+    """
+    Vectorized equirectangular_distance from many points to a single point
+    Returns distances in miles, NaN wherever lats/lons are NaN
+    """
+    lat_avg = np.radians((lats + lat2) / 2)
+    dx = np.radians(lon2 - lons) * np.cos(lat_avg)
+    dy = np.radians(lat2 - lats)
+    return 3959 * np.hypot(dx, dy)
+
+
 def geocode_address_nominatim(address: str) -> Optional[Tuple[float, float]]:
     """
     Geocode an address using OpenStreetMap's Nominatim API (free, no API key)
+    Results are cached in memory and on disk (geocode_cache.py), so repeat lookups
+    skip the rate-limit sleep and the HTTP call.
     Returns (latitude, longitude) or None if not found
     """
     try:
-        # Rate limiting - be respectful to free API
-        time.sleep(1)
-        
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            'q': address,
-            'format': 'json',
-            'limit': 1
-        }
-        headers = {
-            'User-Agent': 'ApartmentHuntOptimizer/1.0'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        if data and len(data) > 0:
-            lat = float(data[0]['lat'])
-            lon = float(data[0]['lon'])
-            return (lat, lon)
-        
-        return None
+        return _geocode_cached(geocode_cache.normalize_address(address), address)
         
     except Exception as e:
         print(f"Geocoding error for '{address}': {e}")
         return None
 
 
+def geocode_many(addresses: Iterable[str]) -> Dict[str, Optional[Tuple[float, float]]]:
+    """
+    Geocode several addresses concurrently
+    Cached addresses resolve immediately; the rest share the global
+    Nominatim rate limit, so network waits overlap instead of queueing.
+    Spellings of the same address (same cache key) are looked up once.
+    Returns a dict mapping each address to (latitude, longitude) or None
+    """
+    by_key: Dict[str, List[str]] = {}
+    for address in dict.fromkeys(addresses):
+        by_key.setdefault(geocode_cache.normalize_address(address), []).append(address)
+    
+    groups = list(by_key.values())
+    results = {}
+    for group, coords in zip(groups, _pool.map(geocode_address_nominatim, [group[0] for group in groups])):
+        for address in group:
+            results[address] = coords
+    
+    return results
+
+
+def geocode_batch(listings: Sequence[Listing]) -> List[Optional[Tuple[float, float]]]:
+    """
+    Locate many listings in a single pre-pass
+    Stored coordinates are used as-is; the rest are geocoded by full address
+    (see listing_address), each distinct address once. Nominatim has no
+    batch endpoint, so those go through geocode_many, where cached addresses
+    resolve without a request.
+    Returns a list of (latitude, longitude) or None, parallel to listings
+    """
+    results: List[Optional[Tuple[float, float]]] = [None] * len(listings)
+    pending: Dict[str, List[int]] = {}
+    
+    for i, listing in enumerate(listings):
+        lat = listing.get('latitude')
+        lng = listing.get('longitude')
+        if lat and lng:
+            results[i] = (float(lat), float(lng))
+        elif listing.get('address'):
+            pending.setdefault(listing_address(listing), []).append(i)
+    
+    if pending:
+        for address, coords in geocode_many(pending).items():
+            for i in pending[address]:
+                results[i] = coords
+    
+    return results
+
+
+def _geocode_cached(key: str, address: str) -> Optional[Tuple[float, float]]:
+    """
+    Resolve an address through the in-memory and on-disk caches, falling
+    back to Nominatim. Network errors propagate so that they are never cached.
+    """
+    with _memo_lock:
+        entry = _memo.get(key)
+        if entry is not None and time.time() < entry[1]:
+            _memo.move_to_end(key)
+            return entry[0]
+    
+    hit, coords, expires_at = geocode_cache.lookup(key)
+    if not hit:
+        coords = _query_nominatim(address)
+        expires_at = geocode_cache.store(key, address, coords)
+    
+    with _memo_lock:
+        _memo[key] = (coords, expires_at)
+        _memo.move_to_end(key)
+        if len(_memo) > GEOCODE_MEMO_SIZE:
+            _memo.popitem(last=False)
+    
+    return coords
+
+
+def _wait_for_rate_limit():
+    """
+    Block until this caller's request slot, keeping requests at least
+    NOMINATIM_MIN_INTERVAL apart. Slots are reserved under the lock but
+    waited for outside it, and the first request (or one after a quiet
+    spell) doesn't wait at all.
+    """
+    global _next_request
+    with _rate_lock:
+        now = time.monotonic()
+        slot = max(now, _next_request)
+        _next_request = slot + NOMINATIM_MIN_INTERVAL
+    
+    if slot > now:
+        time.sleep(slot - now)
+
+
+def _query_nominatim(address: str) -> Optional[Tuple[float, float]]:
+    """
+    Query Nominatim for an address, returns None if it has no match
+    Throttled, failed and dropped requests are retried up to
+    NOMINATIM_RETRIES times, backing off a little longer each time.
+    """
+    url = "https://nominatim.openstreetmap.org/search"
+    params: Dict[str, Any] = {
+        'q': address,
+        'format': 'json',
+        'limit': 1
+    }
+    
+    for attempt in range(NOMINATIM_RETRIES + 1):
+        if attempt:
+            time.sleep(NOMINATIM_MIN_INTERVAL * 2 ** (attempt - 1))
+        _wait_for_rate_limit()
+        
+        try:
+            response = _session.get(url, params=params, timeout=10)
+        except requests.ConnectionError:
+            if attempt == NOMINATIM_RETRIES:
+                raise
+            continue
+        
+        if response.status_code not in NOMINATIM_RETRY_STATUSES:
+            break
+    
+    response.raise_for_status()
+    
+    data = response.json()
+    if data and len(data) > 0:
+        lat = float(data[0]['lat'])
+        lon = float(data[0]['lon'])
+        return (lat, lon)
+    
+    return None
+
+
 def estimate_commute_time(distance_miles: float, method: str = 'driving') -> int:
     """
     Estimate commute time in minutes based on distance and method
@@ -85,7 +278,7 @@ def estimate_commute_time(distance_miles: float, method: str = 'driving') -> int
     return time_minutes
 
 
-def get_coordinates_from_listing(listing: dict) -> Optional[Tuple[float, float]]:
+def get_coordinates_from_listing(listing: Listing) -> Optional[Tuple[float, float]]:
     """
     Extract coordinates from listing data or geocode the address
     
@@ -105,11 +298,33 @@ def get_coordinates_from_listing(listing: dict) -> Optional[Tuple[float, float]]
     # Otherwise geocode the address
     address = listing.get('address')
     if address:
-        return geocode_address_nominatim(address)
+        try:
+            query = listing_address(listing)
+            return _geocode_cached(geocode_cache.normalize_address(query), query)
+        except Exception as e:
+            print(f"Geocoding error for '{address}': {e}")
+            return None
     
     return None
 
 
+def listing_address(listing: Listing) -> str:
+    """
+    Full geocoding query for a listing: the street address plus any city,
+    state or zip it doesn't already contain
+    """
+    address = listing.get('address') or ''
+    parts = [address]
+    lowered = address.lower()
+    
+    for key in ('city', 'state', 'zip_code'):
+        value = listing.get(key)
+        if value and str(value).lower() not in lowered:
+            parts.append(str(value))
+    
+    return ', '.join(parts)
+
+
 if __name__ == "__main__":
     # Test geocoding
     coords = geocode_address_nominatim("Des Moines, IA")
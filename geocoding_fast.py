@@ -0,0 +1,39 @@
+"""Compiled distance kernels for scoring many listings at once"""
+
+import math
+import numpy as np
+from typing import Callable
+from geocoding import equirectangular_distance_array
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# fastmath minus 'nnan'/'ninf': missing coordinates are NaN and must stay NaN
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+
+# Distance in miles from each (lats[i], lngs[i]) to one (lat, lng) point
+equirectangular_batch: Callable[[np.ndarray, np.ndarray, float, float], np.ndarray]
+
+if HAVE_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, cache=True)
+    def _equirectangular_kernel(lats: np.ndarray, lngs: np.ndarray, lat2: float, lng2: float) -> np.ndarray:
+        """
+        Flat-earth distance in miles from every (lats[i], lngs[i]) to one point
+        NaN wherever lats/lngs are NaN
+        """
+        out = np.empty(lats.shape[0])
+        for i in prange(lats.shape[0]):
+            lat_avg = math.radians((lats[i] + lat2) / 2)
+            dx = math.radians(lng2 - lngs[i]) * math.cos(lat_avg)
+            dy = math.radians(lat2 - lats[i])
+            out[i] = 3959 * math.hypot(dx, dy)
+        return out
+    
+    equirectangular_batch = _equirectangular_kernel
+else:
+    # numba is optional, fall back to the NumPy version
+    equirectangular_batch = equirectangular_distance_array
@@ -0,0 +1,71 @@
+"""Struct-of-arrays view of a list of apartment listings"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, List, Protocol, Sequence
+
+# Numeric fields pulled out of each listing, in row order
+FIELDS = ('price', 'bedrooms', 'bathrooms', 'sqft', 'latitude', 'longitude')
+
+
+class Listing(Protocol):
+    """A listing dict, or a record with dict-style .get such as RankingListing"""
+    
+    def get(self, key: str, default: Any = None, /) -> Any: ...
+
+
+@dataclass(slots=True)
+class ListingBatch:
+    """
+    Listings as parallel float64 arrays (NaN where a value is missing), so
+    filters and scoring touch only the columns they need. The listings
+    themselves are kept in meta for display.
+    """
+    meta: List[Any]
+    prices: np.ndarray
+    bedrooms: np.ndarray
+    bathrooms: np.ndarray
+    sqfts: np.ndarray
+    lats: np.ndarray
+    lngs: np.ndarray
+    
+    @classmethod
+    def from_listings(cls, listings: Sequence[Any]) -> 'ListingBatch':
+        """
+        Build a batch from listing dicts (or anything with a dict-style .get)
+        in one pass. Coordinates count as missing unless both are set.
+        """
+        return cls.from_rows(
+            list(listings),
+            [tuple(listing.get(field) for field in FIELDS) for listing in listings]
+        )
+    
+    @classmethod
+    def from_rows(cls, meta: List[Any], rows: Sequence[Sequence[Any]]) -> 'ListingBatch':
+        """
+        Build a batch from the listings in meta and their numeric values as
+        tuples in FIELDS order (None where missing)
+        """
+        values = np.array(rows, dtype=np.float64).reshape(len(meta), len(FIELDS))
+        prices, bedrooms, bathrooms, sqfts, lats, lngs = (np.ascontiguousarray(col) for col in values.T)
+        
+        unlocated = np.isnan(lats) | np.isnan(lngs) | (lats == 0) | (lngs == 0)
+        lats[unlocated] = np.nan
+        lngs[unlocated] = np.nan
+        
+        return cls(meta, prices, bedrooms, bathrooms, sqfts, lats, lngs)
+    
+    def __len__(self) -> int:
+        return len(self.meta)
+    
+    def take(self, indices: np.ndarray) -> 'ListingBatch':
+        """New batch holding just the listings at indices, in that order"""
+        return ListingBatch(
+            [self.meta[i] for i in indices],
+            self.prices[indices],
+            self.bedrooms[indices],
+            self.bathrooms[indices],
+            self.sqfts[indices],
+            self.lats[indices],
+            self.lngs[indices]
+        )
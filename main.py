@@ -1,8 +1,10 @@
 """Main script to run apartment scraping and storage"""
 
 import sys
-from database import init_db, insert_apartment, get_all_apartments, mark_inactive_listings
+from database import init_db, insert_apartments_bulk, get_all_apartments, mark_inactive_listings
 from scraper import ZillowScraper
+from geocoding import geocode_batch
+from geocode_cache import purge_expired
 
 
 def run_scraper(max_pages: int = 3):
@@ -24,17 +26,20 @@ def run_scraper(max_pages: int = 3):
         print("No listings found. Check if scraper needs adjustment.")
         return
     
+    # Geocode listings Zillow didn't give coordinates for, so ranking never has to
+    missing = [l for l in listings if l.get('latitude') is None or l.get('longitude') is None]
+    if missing:
+        print(f"\nGeocoding {len(missing)} listing(s) without coordinates...")
+        purged = purge_expired()
+        if purged:
+            print(f"Purged {purged} expired geocode cache entries")
+        for listing, coords in zip(missing, geocode_batch(missing)):
+            if coords:
+                listing['latitude'], listing['longitude'] = coords
+    
     # Store in database
     print("\nStoring listings in database...")
-    new_count = 0
-    updated_count = 0
-    
-    for listing in listings:
-        is_new = insert_apartment(listing)
-        if is_new:
-            new_count += 1
-        else:
-            updated_count += 1
+    new_count, updated_count = insert_apartments_bulk(listings)
     
     print(f"\nNew listings: {new_count}")
     print(f"Updated listings: {updated_count}")
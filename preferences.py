@@ -1,35 +1,35 @@
 """User preferences for apartment scoring"""
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 class UserPreferences:
     def __init__(self):
         # Work location (for commute calculation)
-        self.work_address = ""
-        self.work_lat = None
-        self.work_lng = None
+        self.work_address: str = ""
+        self.work_lat: Optional[float] = None
+        self.work_lng: Optional[float] = None
         
         # Budget constraints
-        self.max_rent = 2000
-        self.min_rent = 0
+        self.max_rent: int = 2000
+        self.min_rent: int = 0
         
         # Space requirements
-        self.min_bedrooms = 1
-        self.min_bathrooms = 1
-        self.min_sqft = 0
+        self.min_bedrooms: float = 1
+        self.min_bathrooms: float = 1
+        self.min_sqft: int = 0
         
         # Must-have amenities (not used in Phase 1, placeholder for future)
-        self.required_amenities = []
+        self.required_amenities: List[str] = []
         
         # Scoring weights (must sum to 100)
-        self.weights = {
+        self.weights: Dict[str, int] = {
             'commute': 40,      # 40% weight on commute time
             'price_value': 30,  # 30% weight on price/value ratio
             'space': 20,        # 20% weight on size
             'location': 10,     # 10% weight on neighborhood
         }
     
-    def set_work_location(self, address: str, lat: float = None, lng: float = None):
+    def set_work_location(self, address: str, lat: Optional[float] = None, lng: Optional[float] = None):
         """Set work location for commute calculations"""
         self.work_address = address
         self.work_lat = lat
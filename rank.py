@@ -1,13 +1,15 @@
 """Rank apartments based on user preferences"""
 
+import heapq
 import sys
-from database import get_all_apartments
+from typing import Optional
+from database import get_apartments_for_ranking
 from preferences import UserPreferences
-from scoring import ApartmentScorer, filter_apartments
+from scoring import ApartmentScorer
 from geocoding import geocode_address_nominatim
 
 
-def rank_apartments(work_address: str = None, max_rent: int = 1500, min_bedrooms: float = 1):
+def rank_apartments(work_address: Optional[str] = None, max_rent: int = 1500, min_bedrooms: float = 1):
     """
     Rank apartments based on user preferences
     
@@ -47,14 +49,12 @@ def rank_apartments(work_address: str = None, max_rent: int = 1500, min_bedrooms
     print(f"  Space: {prefs.weights['space']}%")
     print(f"  Location: {prefs.weights['location']}%")
     
-    # Get all apartments
-    print(f"\nLoading apartments from database...")
-    listings = get_all_apartments(active_only=True)
-    print(f"Found {len(listings)} active listings")
-    
-    # Filter by requirements
-    print(f"Filtering by requirements...")
-    filtered = filter_apartments(listings, prefs)
+    # Load apartments meeting the requirements
+    print(f"\nLoading matching apartments from database...")
+    filtered = get_apartments_for_ranking(
+        prefs.min_rent, prefs.max_rent, prefs.min_bedrooms,
+        prefs.min_bathrooms, prefs.min_sqft
+    )
     print(f"{len(filtered)} apartments match your requirements")
     
     if not filtered:
@@ -66,8 +66,7 @@ def rank_apartments(work_address: str = None, max_rent: int = 1500, min_bedrooms
     scorer = ApartmentScorer(prefs)
     
     ranked = []
-    for listing in filtered:
-        score_data = scorer.score_apartment(listing)
+    for listing, score_data in zip(filtered, scorer.score_apartments(filtered)):
         ranked.append({
             'listing': listing,
             'score': score_data['total_score'],
@@ -75,24 +74,24 @@ def rank_apartments(work_address: str = None, max_rent: int = 1500, min_bedrooms
             'commute_info': score_data['commute_info']
         })
     
-    # Sort by score (highest first)
-    ranked.sort(key=lambda x: x['score'], reverse=True)
+    # Pick the top 10 (highest first) without sorting the rest
+    top = heapq.nlargest(10, ranked, key=lambda x: x['score'])
     
     # Display top matches
     print("\n" + "=" * 80)
     print(f"TOP 10 MATCHES (out of {len(ranked)} qualifying apartments)")
     print("=" * 80)
     
-    for i, item in enumerate(ranked[:10], 1):
+    for i, item in enumerate(top, 1):
         listing = item['listing']
         score = item['score']
         breakdown = item['breakdown']
         commute_info = item['commute_info']
         
-        print(f"\n{i}. SCORE: {score:.1f}/100 - {listing['address']}")
-        print(f"   ${listing['price']}/mo | {listing.get('bedrooms', '?')} bed | {listing.get('bathrooms', '?')} bath", end="")
-        if listing.get('sqft'):
-            print(f" | {listing['sqft']} sqft")
+        print(f"\n{i}. SCORE: {score:.1f}/100 - {listing.address}")
+        print(f"   ${listing.price}/mo | {listing.bedrooms} bed | {listing.bathrooms} bath", end="")
+        if listing.sqft:
+            print(f" | {listing.sqft} sqft")
         else:
             print()
         
@@ -106,7 +105,7 @@ def rank_apartments(work_address: str = None, max_rent: int = 1500, min_bedrooms
             print(f" {category.title()}: {data['score']:.1f}", end=" |")
         print()
         
-        print(f"   {listing['listing_url']}")
+        print(f"   {listing.listing_url}")
     
     print("\n" + "=" * 80)
     
@@ -114,16 +113,16 @@ def rank_apartments(work_address: str = None, max_rent: int = 1500, min_bedrooms
     if ranked:
         avg_score = sum(r['score'] for r in ranked) / len(ranked)
         print(f"\nAverage score: {avg_score:.1f}/100")
-        print(f"Top score: {ranked[0]['score']:.1f}/100")
+        print(f"Top score: {top[0]['score']:.1f}/100")
         if len(ranked) > 1:
-            print(f"Lowest score: {ranked[-1]['score']:.1f}/100")
+            print(f"Lowest score: {min(r['score'] for r in ranked):.1f}/100")
 
 
 if __name__ == "__main__":
     # Parse command line arguments
     work_address = None
     max_rent = 1500
-    min_bedrooms = 1
+    min_bedrooms: float = 1
     
     if len(sys.argv) > 1:
         # First arg: work address
@@ -1,58 +1,252 @@
 """Apartment scoring algorithm"""
 
-from typing import Dict, List, Optional
+import numpy as np
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
 from preferences import UserPreferences
-from geocoding import get_coordinates_from_listing, haversine_distance, estimate_commute_time
+from listing_batch import Listing, ListingBatch
+from geocoding import (
+    get_coordinates_from_listing, geocode_batch, equirectangular_distance, estimate_commute_time
+)
+from geocoding_fast import equirectangular_batch
+
+# Des Moines downtown coordinates (approximately)
+DOWNTOWN_LAT, DOWNTOWN_LNG = 41.5868, -93.6250
 
 
 class ApartmentScorer:
     def __init__(self, preferences: UserPreferences):
         self.prefs = preferences
+        
+        # Score bands: upper bounds (inclusive) and the points for each band,
+        # with one extra entry for values past the last bound
+        weights = preferences.weights
+        self._commute_bins = np.array([10, 20, 30, 45])
+        self._commute_points = np.array([1.0, 0.75, 0.5, 0.25, 0.0]) * weights['commute']
+        self._price_per_sqft_bins = np.array([0.75, 1.00, 1.50])
+        self._price_per_sqft_points = np.array([0.4, 0.3, 0.2, 0.1]) * weights['price_value']
+        self._location_bins = np.array([2, 5, 10])
+        self._location_points = np.array([1.0, 0.75, 0.5, 0.25]) * weights['location']
     
-    def score_apartment(self, listing: Dict) -> Dict:
+    def score_apartment(self, listing: Listing) -> Dict:
         """
         Score an apartment based on user preferences
         
         Returns:
             Dict with 'total_score', 'breakdown', and 'commute_info'
         """
-        scores = {}
-        breakdown = {}
-        commute_info = None
+        coords = get_coordinates_from_listing(listing)
+        
+        work_lat, work_lng = self.prefs.work_lat, self.prefs.work_lng
+        commute_distance = None
+        downtown_distance = None
+        if coords:
+            if work_lat and work_lng:
+                commute_distance = equirectangular_distance(
+                    coords[0], coords[1],
+                    work_lat, work_lng
+                )
+            downtown_distance = equirectangular_distance(
+                coords[0], coords[1],
+                DOWNTOWN_LAT, DOWNTOWN_LNG
+            )
+        
+        return self._score(listing, commute_distance, downtown_distance)
+    
+    def score_apartments(self, listings: Sequence[Listing]) -> List[Dict]:
+        """
+        Score many apartments at once (see score_batch)
+        
+        Returns:
+            List of score dicts (see score_apartment), in the same order as listings
+        """
+        return self.score_batch(ListingBatch.from_listings(listings))
+    
+    def score_batch(self, batch: ListingBatch) -> List[Dict]:
+        """
+        Score a batch of apartments held as columns. Distances and all four
+        category scores are computed as NumPy column operations over the
+        whole batch; only assembling the per-listing result dicts happens
+        in Python. Listings without coordinates are geocoded by address first.
+        
+        Returns:
+            List of score dicts (see score_apartment), in the same order as batch.meta
+        """
+        listings = batch.meta
+        lats, lngs = batch.lats, batch.lngs
+        
+        # Geocode listings without stored coordinates in one pass up front
+        missing = np.flatnonzero(np.isnan(lats) | np.isnan(lngs))
+        if len(missing):
+            located = geocode_batch([listings[i] for i in missing])
+            lats, lngs = lats.copy(), lngs.copy()
+            for row, coords in zip(missing, located):
+                if coords:
+                    lats[row], lngs[row] = coords
+        
+        # Commutes are short enough for the flat-earth approximation;
+        # NaN marks listings that couldn't be located
+        work_lat, work_lng = self.prefs.work_lat, self.prefs.work_lng
+        if work_lat and work_lng:
+            has_work = True
+            commute_distances = equirectangular_batch(lats, lngs, work_lat, work_lng)
+        else:
+            has_work = False
+            commute_distances = np.full(len(listings), np.nan)
+        downtown_distances = equirectangular_batch(lats, lngs, DOWNTOWN_LAT, DOWNTOWN_LNG)
+        
+        commute_scores, commute_minutes = self._commute_scores(commute_distances)
+        price_scores = self._price_value_scores(batch.prices, batch.sqfts)
+        space_scores = self._space_scores(batch.bedrooms, batch.bathrooms, batch.sqfts)
+        location_scores = self._location_scores(downtown_distances)
+        totals = commute_scores + price_scores + space_scores + location_scores
+        
+        weights = self.prefs.weights
+        results = []
+        for i, listing in enumerate(listings):
+            commute_info: Optional[Dict[str, Any]]
+            if not has_work:
+                commute_info = None
+            elif np.isnan(commute_distances[i]):
+                commute_info = {'error': 'Could not determine location'}
+            else:
+                commute_info = {
+                    'distance_miles': round(float(commute_distances[i]), 1),
+                    'estimated_minutes': int(commute_minutes[i])
+                }
+            
+            results.append({
+                'total_score': round(float(totals[i]), 1),
+                'breakdown': {
+                    'commute': {
+                        'score': float(commute_scores[i]),
+                        'weight': weights['commute'],
+                        'info': commute_info
+                    },
+                    'price_value': {
+                        'score': float(price_scores[i]),
+                        'weight': weights['price_value'],
+                        'info': f"${listing.get('price', 0)}/mo"
+                    },
+                    'space': {
+                        'score': float(space_scores[i]),
+                        'weight': weights['space'],
+                        'info': f"{listing.get('sqft', 'N/A')} sqft"
+                    },
+                    'location': {
+                        'score': float(location_scores[i]),
+                        'weight': weights['location'],
+                        'info': 'Based on distance to downtown'
+                    }
+                },
+                'commute_info': commute_info
+            })
+        
+        return results
+    
+    def _commute_scores(self, distances: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Vectorized _score_commute, returns (scores, estimated minutes)"""
+        max_points = self.prefs.weights['commute']
+        
+        if not self.prefs.work_lat or not self.prefs.work_lng:
+            return np.full(len(distances), max_points / 2), np.full(len(distances), np.nan)
+        
+        minutes = np.floor(distances / 30 * 60)  # estimate_commute_time, driving
+        scores = self._commute_points[np.searchsorted(self._commute_bins, minutes)]
+        scores = np.where(np.isnan(distances), max_points * 0.3, scores)
+        return scores, minutes
+    
+    def _price_value_scores(self, prices: np.ndarray, sqfts: np.ndarray) -> np.ndarray:
+        """Vectorized _score_price_value"""
+        max_points = self.prefs.weights['price_value']
+        
+        budget_scores = np.where(
+            prices > self.prefs.max_rent,
+            0.0,
+            (1 - prices / self.prefs.max_rent) * max_points * 0.6
+        )
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_per_sqft = prices / sqfts
+        value_scores = self._price_per_sqft_points[np.searchsorted(self._price_per_sqft_bins, price_per_sqft)]
+        value_scores = np.where(sqfts > 0, value_scores, max_points * 0.2)
+        
+        return np.where(np.isnan(prices) | (prices == 0), 0.0, budget_scores + value_scores)
+    
+    def _space_scores(self, bedrooms: np.ndarray, bathrooms: np.ndarray, sqfts: np.ndarray) -> np.ndarray:
+        """Vectorized _score_space"""
+        max_points = self.prefs.weights['space']
+        scores = np.zeros(len(bedrooms))
+        
+        bedroom_scores = np.minimum(1.0, bedrooms / (self.prefs.min_bedrooms + 1))
+        scores += np.where(bedrooms >= self.prefs.min_bedrooms, bedroom_scores * max_points * 0.4, 0.0)
+        
+        bathroom_scores = np.minimum(1.0, bathrooms / (self.prefs.min_bathrooms + 0.5))
+        scores += np.where(bathrooms >= self.prefs.min_bathrooms, bathroom_scores * max_points * 0.3, 0.0)
+        
+        target_sqft = max(600, self.prefs.min_sqft)
+        sqft_ratios = np.minimum(1.0, sqfts / target_sqft)
+        scores += np.where(sqfts >= self.prefs.min_sqft, sqft_ratios * max_points * 0.3, 0.0)
+        
+        return scores
+    
+    def _location_scores(self, distances: np.ndarray) -> np.ndarray:
+        """Vectorized _score_location"""
+        max_points = self.prefs.weights['location']
+        
+        scores = self._location_points[np.searchsorted(self._location_bins, distances)]
+        return np.where(np.isnan(distances), max_points * 0.5, scores)
+    
+    def _score(self, listing: Listing, commute_distance: Optional[float],
+               downtown_distance: Optional[float]) -> Dict:
+        """Score an apartment given its precomputed distances (None if unknown)"""
+        scores: Dict[str, float] = {}
+        breakdown: Dict[str, Dict[str, Any]] = {}
+        
+        weights = self.prefs.weights
+        commute_points = weights['commute']
+        price_value_points = weights['price_value']
+        space_points = weights['space']
+        location_points = weights['location']
         
         # 1. Commute Score (0-40 points)
-        commute_score, commute_info = self._score_commute(listing)
+        commute_score, commute_info = self._score_commute(commute_distance, commute_points)
         scores['commute'] = commute_score
         breakdown['commute'] = {
             'score': commute_score,
-            'weight': self.prefs.weights['commute'],
+            'weight': commute_points,
             'info': commute_info
         }
         
+        price = listing.get('price')
+        sqft = listing.get('sqft')
+        
         # 2. Price/Value Score (0-30 points)
-        price_score = self._score_price_value(listing)
+        price_score = self._score_price_value(price, sqft, price_value_points)
         scores['price_value'] = price_score
         breakdown['price_value'] = {
             'score': price_score,
-            'weight': self.prefs.weights['price_value'],
+            'weight': price_value_points,
             'info': f"${listing.get('price', 0)}/mo"
         }
         
         # 3. Space Score (0-20 points)
-        space_score = self._score_space(listing)
+        space_score = self._score_space(
+            listing.get('bedrooms', 0), listing.get('bathrooms', 0), sqft, space_points
+        )
         scores['space'] = space_score
         breakdown['space'] = {
             'score': space_score,
-            'weight': self.prefs.weights['space'],
+            'weight': space_points,
             'info': f"{listing.get('sqft', 'N/A')} sqft"
         }
         
         # 4. Location Score (0-10 points) - placeholder for now
-        location_score = self._score_location(listing)
+        location_score = self._score_location(downtown_distance, location_points)
         scores['location'] = location_score
         breakdown['location'] = {
             'score': location_score,
-            'weight': self.prefs.weights['location'],
+            'weight': location_points,
             'info': 'Based on distance to downtown'
         }
         
@@ -65,7 +259,7 @@ class ApartmentScorer:
             'commute_info': commute_info
         }
     
-    def _score_commute(self, listing: Dict) -> tuple[float, Optional[Dict]]:
+    def _score_commute(self, distance: Optional[float], max_points: float) -> tuple[float, Optional[Dict]]:
         """
         Score based on commute time
         40 points = 0-10 min commute
@@ -76,34 +270,17 @@ class ApartmentScorer:
         """
         if not self.prefs.work_lat or not self.prefs.work_lng:
             # No work location set, give neutral score
-            return self.prefs.weights['commute'] / 2, None
+            return max_points / 2, None
         
-        coords = get_coordinates_from_listing(listing)
-        if not coords:
+        if distance is None:
             # Can't geocode, give penalty
-            return self.prefs.weights['commute'] * 0.3, {'error': 'Could not determine location'}
-        
-        # Calculate distance
-        distance = haversine_distance(
-            coords[0], coords[1],
-            self.prefs.work_lat, self.prefs.work_lng
-        )
+            return max_points * 0.3, {'error': 'Could not determine location'}
         
         # Estimate commute time
         commute_minutes = estimate_commute_time(distance, 'driving')
         
         # Score based on commute time
-        max_points = self.prefs.weights['commute']
-        if commute_minutes <= 10:
-            score = max_points
-        elif commute_minutes <= 20:
-            score = max_points * 0.75
-        elif commute_minutes <= 30:
-            score = max_points * 0.5
-        elif commute_minutes <= 45:
-            score = max_points * 0.25
-        else:
-            score = 0
+        score = float(self._commute_points[bisect_left(self._commute_bins, commute_minutes)])
         
         commute_info = {
             'distance_miles': round(distance, 1),
@@ -112,67 +289,53 @@ class ApartmentScorer:
         
         return score, commute_info
     
-    def _score_price_value(self, listing: Dict) -> float:
+    def _score_price_value(self, price: Optional[float], sqft: Optional[float], max_points: float) -> float:
         """
         Score based on price relative to budget and size
         Better value = higher score
         """
-        price = listing.get('price')
         if not price:
-            return 0
-        
-        max_points = self.prefs.weights['price_value']
+            return 0.0
         
         # Factor 1: Price relative to max budget (60% of score)
         if price > self.prefs.max_rent:
-            budget_score = 0  # Over budget = 0 points
+            budget_score = 0.0  # Over budget = 0 points
         else:
             # Lower price = better score
             price_ratio = price / self.prefs.max_rent
             budget_score = (1 - price_ratio) * max_points * 0.6
         
         # Factor 2: Price per sqft (40% of score)
-        sqft = listing.get('sqft')
         if sqft and sqft > 0:
             price_per_sqft = price / sqft
             # Typical range: $0.75 - $2.00 per sqft
             # Lower is better
-            if price_per_sqft <= 0.75:
-                value_score = max_points * 0.4
-            elif price_per_sqft <= 1.00:
-                value_score = max_points * 0.3
-            elif price_per_sqft <= 1.50:
-                value_score = max_points * 0.2
-            else:
-                value_score = max_points * 0.1
+            value_score = float(self._price_per_sqft_points[bisect_left(self._price_per_sqft_bins, price_per_sqft)])
         else:
             # No sqft data, use just budget score
             value_score = max_points * 0.2  # Neutral
         
         return budget_score + value_score
     
-    def _score_space(self, listing: Dict) -> float:
+    def _score_space(self, bedrooms: Optional[float], bathrooms: Optional[float],
+                     sqft: Optional[float], max_points: float) -> float:
         """
         Score based on size (bedrooms, bathrooms, sqft)
         """
-        max_points = self.prefs.weights['space']
-        score = 0
+        score = 0.0
         
         # Bedrooms (40% of space score)
-        bedrooms = listing.get('bedrooms', 0)
-        if bedrooms >= self.prefs.min_bedrooms:
+        if bedrooms is not None and bedrooms >= self.prefs.min_bedrooms:
             # Extra bedrooms add value
             bedroom_score = min(1.0, bedrooms / (self.prefs.min_bedrooms + 1))
             score += bedroom_score * max_points * 0.4
         
         # Bathrooms (30% of space score)
-        bathrooms = listing.get('bathrooms', 0)
         if bathrooms and bathrooms >= self.prefs.min_bathrooms:
             bathroom_score = min(1.0, bathrooms / (self.prefs.min_bathrooms + 0.5))
             score += bathroom_score * max_points * 0.3
         
         # Square footage (30% of space score)
-        sqft = listing.get('sqft', 0)
         if sqft:
             if sqft >= self.prefs.min_sqft:
                 # Typical 1BR: 600-800 sqft, 2BR: 900-1200 sqft
@@ -182,36 +345,16 @@ class ApartmentScorer:
         
         return score
     
-    def _score_location(self, listing: Dict) -> float:
+    def _score_location(self, distance: Optional[float], max_points: float) -> float:
         """
         Score based on location quality
         For now, use distance to downtown Des Moines as proxy
         """
-        max_points = self.prefs.weights['location']
-        
-        # Des Moines downtown coordinates (approximately)
-        downtown_lat, downtown_lng = 41.5868, -93.6250
-        
-        coords = get_coordinates_from_listing(listing)
-        if not coords:
+        if distance is None:
             return max_points * 0.5  # Neutral score
         
-        distance = haversine_distance(
-            coords[0], coords[1],
-            downtown_lat, downtown_lng
-        )
-        
-        # Score based on distance to downtown
-        if distance <= 2:
-            score = max_points  # Downtown
-        elif distance <= 5:
-            score = max_points * 0.75  # Close to downtown
-        elif distance <= 10:
-            score = max_points * 0.5  # Suburbs
-        else:
-            score = max_points * 0.25  # Far suburbs
-        
-        return score
+        # Score based on distance to downtown: downtown, close, suburbs, far suburbs
+        return float(self._location_points[bisect_left(self._location_bins, distance)])
 
 
 def filter_apartments(listings: List[Dict], preferences: UserPreferences) -> List[Dict]:
@@ -225,29 +368,37 @@ def filter_apartments(listings: List[Dict], preferences: UserPreferences) -> Lis
     Returns:
         Filtered list of apartments that meet minimum requirements
     """
-    filtered = []
+    min_rent, max_rent = preferences.min_rent, preferences.max_rent
+    min_bedrooms = preferences.min_bedrooms
+    min_bathrooms = preferences.min_bathrooms
+    min_sqft = preferences.min_sqft
     
-    for listing in listings:
-        # Check budget
-        price = listing.get('price', 0)
-        if price and (price < preferences.min_rent or price > preferences.max_rent):
-            continue
-        
-        # Check bedrooms
-        bedrooms = listing.get('bedrooms', 0)
-        if bedrooms is not None and bedrooms < preferences.min_bedrooms:
-            continue
-        
-        # Check bathrooms
-        bathrooms = listing.get('bathrooms')
-        if bathrooms and bathrooms < preferences.min_bathrooms:
-            continue
-        
-        # Check sqft
-        sqft = listing.get('sqft', 0)
-        if sqft and sqft < preferences.min_sqft:
-            continue
-        
-        filtered.append(listing)
+    # Same rules as requirements_mask; for a list of dicts a single pass is
+    # cheaper than building the columns first
+    return [
+        listing for listing in listings
+        if (not (price := listing.get('price', 0)) or min_rent <= price <= max_rent)
+        and ((bedrooms := listing.get('bedrooms', 0)) is None or bedrooms >= min_bedrooms)
+        and (not (bathrooms := listing.get('bathrooms')) or bathrooms >= min_bathrooms)
+        and (not (sqft := listing.get('sqft', 0)) or sqft >= min_sqft)
+    ]
+
+
+def requirements_mask(batch: ListingBatch, preferences: UserPreferences) -> np.ndarray:
+    """
+    Boolean mask of the listings in batch meeting the hard requirements
+    A missing or zero price, bathroom count or sqft doesn't exclude a
+    listing, nor does a missing bedroom count
+    """
+    prices = batch.prices
+    bedrooms = batch.bedrooms
+    bathrooms = batch.bathrooms
+    sqfts = batch.sqfts
     
-    return filtered
+    return (
+        (np.isnan(prices) | (prices == 0)
+         | ((prices >= preferences.min_rent) & (prices <= preferences.max_rent)))
+        & (np.isnan(bedrooms) | (bedrooms >= preferences.min_bedrooms))
+        & (np.isnan(bathrooms) | (bathrooms == 0) | (bathrooms >= preferences.min_bathrooms))
+        & (np.isnan(sqfts) | (sqfts == 0) | (sqfts >= preferences.min_sqft))
+    )
@@ -1,105 +1,192 @@
 """Web scraper for Zillow apartment listings"""
 
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import httpx
+import io
 import time
 import re
-import json
-from typing import List, Dict, Optional
+from typing import Any, Callable, Iterable, List, Dict, Optional, Tuple, Type
 from config import (
-    USER_AGENT, REQUEST_TIMEOUT, REQUEST_DELAY,
+    USER_AGENT, REQUEST_TIMEOUT, REQUEST_DELAY, SCRAPER_WORKERS,
     ZILLOW_SEARCH_URL, CITY, STATE
 )
 
+try:
+    import orjson as _json
+except ImportError:
+    # orjson is optional for scraping, fall back to the stdlib
+    import json as _json  # type: ignore[no-redef]
+
+# Errors a malformed __NEXT_DATA__ can raise, from either parser
+_JSON_ERRORS: Tuple[Type[Exception], ...]
+try:
+    import ijson  # type: ignore[import-untyped]
+    # Streaming only pays off with the C backend, the pure Python one is
+    # slower than a full parse
+    _ijson = ijson.get_backend('yajl2_c')
+    _JSON_ERRORS = (_json.JSONDecodeError, ijson.JSONError)
+except ImportError:
+    _ijson = None
+    _JSON_ERRORS = (_json.JSONDecodeError,)
+
+# Where the search results sit in __NEXT_DATA__
+_RESULTS_PATH = ('props', 'pageProps', 'searchPageState', 'cat1', 'searchResults', 'listResults')
+
+# The search results are embedded as JSON in this script tag, so there's no
+# need to build a DOM for the whole page
+_NEXT_DATA_RE = re.compile(rb'<script[^>]*\bid="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+
+# Characters stripped from price strings: $, commas, +, /mo and whitespace,
+# including Unicode spaces such as NBSP like the regex \s it replaces
+# (every whitespace character is at or below U+3000)
+_PRICE_STRIP = str.maketrans('', '', '$,+/mo' + ''.join(
+    c for c in map(chr, range(0x3001)) if c.isspace()
+))
+
+
+def _parse_price_str(price_value: str) -> Optional[int]:
+    """Parse a price string such as '$1,200', '$1,200+' or '$950/mo'"""
+    # Remove $, commas, +, /mo, etc
+    cleaned = price_value.translate(_PRICE_STRIP)
+    try:
+        return int(cleaned)
+    except ValueError:
+        return None
+
+
+# Price parser by exact type; Zillow mostly sends numbers
+_PRICE_DISPATCH: Dict[type, Callable[[Any], Optional[int]]] = {
+    int: int,
+    float: int,
+    str: _parse_price_str,
+    type(None): lambda _: None,
+}
+
 
 class ZillowScraper:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': USER_AGENT,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
-        })
+        }
+        self._next_request = 0.0
+        # Lowest page number that failed in the current scrape
+        self._failed_page = 0
     
     def _parse_price(self, price_value) -> Optional[int]:
-        """Parse price from various formats: int, '$1,200', '$1,200+', etc."""
-        if price_value is None:
-            return None
+        """
+        Parse price from various formats: int, '$1,200', '$1,200+', etc.
+        Exact types are looked up in _PRICE_DISPATCH and subclasses fall
+        through to isinstance checks, so every value parses the same as
+        with a plain isinstance chain, just faster for the common types.
+        """
+        parse = _PRICE_DISPATCH.get(type(price_value))
+        if parse is not None:
+            return parse(price_value)
         
+        # Subclasses of the dispatched types (bool, numpy scalars, ...)
         if isinstance(price_value, (int, float)):
             return int(price_value)
-        
         if isinstance(price_value, str):
-            # Remove $, commas, +, /mo, etc
-            cleaned = re.sub(r'[\$,+/mo\s]', '', price_value)
-            try:
-                return int(cleaned)
-            except ValueError:
-                return None
+            return _parse_price_str(price_value)
         
         return None
     
     def scrape_listings(self, max_pages: int = 3) -> List[Dict]:
+        """
+        Scrape apartment listings from Zillow (see scrape_listings_async)
+        Returns list of apartment data dictionaries
+        """
+        return asyncio.run(self.scrape_listings_async(max_pages))
+    
+    async def scrape_listings_async(self, max_pages: int = 3) -> List[Dict]:
         """
         Scrape apartment listings from Zillow
+        Up to SCRAPER_WORKERS pages are in flight at once, but requests start
+        at least REQUEST_DELAY apart. Results are kept in page order and stop
+        at the first page that failed, as a serial scrape would. Pages after
+        a failed one that haven't been requested yet are skipped.
         Returns list of apartment data dictionaries
         """
+        semaphore = asyncio.Semaphore(SCRAPER_WORKERS)
+        self._failed_page = max_pages + 1
+        
+        # HTTP/2 lets concurrent page fetches share one TLS connection
+        async with httpx.AsyncClient(
+            http2=True,
+            headers=self.headers,
+            timeout=REQUEST_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=SCRAPER_WORKERS)
+        ) as client:
+            pages = await asyncio.gather(*(
+                self._scrape_page(client, semaphore, page) for page in range(1, max_pages + 1)
+            ))
+        
         all_listings = []
+        for listings in pages:
+            if listings is None:
+                break
+            all_listings.extend(listings)
         
-        for page in range(1, max_pages + 1):
-            print(f"\nScraping page {page}...")
+        return all_listings
+    
+    async def _scrape_page(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                           page: int) -> Optional[List[Dict]]:
+        """Fetch and parse one results page, None if the request failed"""
+        # Construct URL with pagination
+        url = ZILLOW_SEARCH_URL
+        if page > 1:
+            url += f"{page}_p/"
+        
+        async with semaphore:
+            # Rate limiting
+            await asyncio.sleep(self._reserve_request_slot())
+            
+            # An earlier page failed, so this one would be discarded anyway
+            if page > self._failed_page:
+                return None
             
-            # Construct URL with pagination
-            url = ZILLOW_SEARCH_URL
-            if page > 1:
-                url += f"{page}_p/"
+            print(f"\nScraping page {page}...")
             
             try:
-                response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+                response = await client.get(url)
                 response.raise_for_status()
                 
-                listings = self._parse_page(response.text)
-                print(f"Found {len(listings)} listings on page {page}")
-                
-                all_listings.extend(listings)
-                
-                # Rate limiting
-                if page < max_pages:
-                    time.sleep(REQUEST_DELAY)
-                    
-            except requests.RequestException as e:
+            except httpx.HTTPError as e:
                 print(f"Error scraping page {page}: {e}")
-                break
+                self._failed_page = min(self._failed_page, page)
+                return None
         
-        return all_listings
+        listings = self._parse_page(response.content)
+        print(f"Found {len(listings)} listings on page {page}")
+        return listings
     
-    def _parse_page(self, html: str) -> List[Dict]:
+    def _reserve_request_slot(self) -> float:
+        """
+        Reserve the next request slot, REQUEST_DELAY after the previous one
+        Returns the seconds to wait for it. No lock is needed since all
+        callers run on the same event loop.
+        """
+        now = time.monotonic()
+        slot = max(now, self._next_request)
+        self._next_request = slot + REQUEST_DELAY
+        return slot - now
+    
+    def _parse_page(self, html: bytes) -> List[Dict]:
         """Parse apartment listings from page HTML by extracting JSON data"""
-        soup = BeautifulSoup(html, 'lxml')
         listings = []
         
         # Find the __NEXT_DATA__ script tag that contains JSON data
-        script_tag = soup.find('script', {'id': '__NEXT_DATA__', 'type': 'application/json'})
+        next_data = self._find_next_data(html)
         
-        if not script_tag:
+        if not next_data:
             print("[ERROR] Could not find __NEXT_DATA__ script tag")
             return listings
         
         try:
-            data = json.loads(script_tag.string)
-            
-            # Navigate to the search results
-            # Path: props -> pageProps -> searchPageState -> cat1 -> searchResults -> listResults
-            search_results = (
-                data.get('props', {})
-                .get('pageProps', {})
-                .get('searchPageState', {})
-                .get('cat1', {})
-                .get('searchResults', {})
-                .get('listResults', [])
-            )
-            
-            for result in search_results:
+            for result in self._iter_results(next_data):
                 # Skip non-dict entries
                 if not isinstance(result, dict):
                     continue
@@ -112,13 +199,43 @@ class ZillowScraper:
                     # Silently skip errors
                     continue
                     
-        except json.JSONDecodeError as e:
+        except _JSON_ERRORS as e:
             print(f"[ERROR] Failed to parse JSON: {e}")
         except Exception as e:
             print(f"[ERROR] Unexpected error: {e}")
         
         return listings
     
+    def _iter_results(self, next_data: bytes) -> Iterable:
+        """
+        Iterate over the search results in __NEXT_DATA__, streaming them
+        with ijson when available instead of loading the whole document
+        """
+        if _ijson is not None:
+            prefix = '.'.join(_RESULTS_PATH) + '.item'
+            return _ijson.items(io.BytesIO(next_data), prefix, use_float=True)
+        
+        data = _json.loads(next_data)
+        try:
+            for key in _RESULTS_PATH:
+                data = data[key]
+        except (KeyError, TypeError):
+            return []
+        return data
+    
+    def _find_next_data(self, html: bytes) -> Optional[bytes]:
+        """Return the body of the __NEXT_DATA__ script tag, or None"""
+        match = _NEXT_DATA_RE.search(html)
+        if match:
+            return match.group(1)
+        
+        # Fall back to a full parse in case the markup doesn't match the regex
+        from bs4 import BeautifulSoup
+        script_tag = BeautifulSoup(html, 'lxml').find('script', {'id': '__NEXT_DATA__'})
+        if script_tag and script_tag.string:
+            return script_tag.string.encode()
+        return None
+    
     def _parse_json_listing(self, result: Dict) -> Optional[Dict]:
         """Parse individual listing from JSON data"""
         try:
@@ -176,6 +293,11 @@ class ZillowScraper:
             if not sqft:
                 sqft = result.get('livingArea')
             
+            # Coordinates, when Zillow includes them
+            lat_long = result.get('latLong') or {}
+            latitude = lat_long.get('latitude')
+            longitude = lat_long.get('longitude')
+            
             # URL
             detail_url = result.get('detailUrl', '')
             listing_url = f"https://www.zillow.com{detail_url}" if detail_url.startswith('/') else detail_url
@@ -196,7 +318,9 @@ class ZillowScraper:
                 'listing_url': listing_url,
                 'source': 'Zillow',
                 'amenities': None,
-                'description': None
+                'description': None,
+                'latitude': float(latitude) if latitude is not None else None,
+                'longitude': float(longitude) if longitude is not None else None
             }
             
         except Exception as e: